@@ -1,14 +1,11 @@
-from typing import List, Dict
+from typing import Dict
 from RAG import ExperimentRAG
+import functools
 import os
 
-class PolicyPromptGenerator:
-    def __init__(self, db_path: str = 'funsearch.db'):
-        self.rag = ExperimentRAG(db_path)
-    
-    def _get_code_template(self) -> str:
-        """Returns the required C++ code template matching ChampSim CRC2 interface"""
-        return '''```cpp
+
+# C++ skeleton matching the ChampSim CRC2 replacement-policy interface
+_CODE_TEMPLATE: str = '''```cpp
 #include <vector>
 #include <cstdint>
 #include <iostream>
@@ -61,53 +58,70 @@ void PrintStats_Heartbeat() {
 }
 ```
 '''
+
+
+@functools.lru_cache(maxsize=256)
+def _read_file_cached(file_path: str, mtime_ns: int) -> str:
+    with open(file_path, 'r') as f:
+        return f.read()
+
+def _read_policy_code(file_path: str) -> str:
+    """Reads the C++ code from a file, raising an error if not found.
+
+    Contents are cached per (path, mtime), so edited files are re-read.
+    """
+    return _read_file_cached(file_path, os.stat(file_path).st_mtime_ns)
+
+
+class PolicyPromptGenerator:
+    def __init__(self, db_path: str = 'funsearch.db'):
+        self.rag = ExperimentRAG(db_path)
     
-    def _read_policy_code(self, file_path: str) -> str:
-        """Reads the C++ code from a file, raising an error if not found"""
-        try:
-            with open(file_path, 'r') as f:
-                return f.read()
-        except FileNotFoundError:
-            raise
+    def _get_code_template(self) -> str:
+        """Returns the required C++ code template matching ChampSim CRC2 interface"""
+        return _CODE_TEMPLATE
     
+    def _format_policy(self, i: int, policy: Dict) -> str:
+        """Formats one example policy block, including its implementation"""
+        code = _read_policy_code(policy['cpp_file_path'])
+        return (
+            f"## Policy {i}\n"
+            f"Name: {policy['policy']}\n"
+            f"Description: {policy['policy_description']}\n"
+            f"Cache Hit Rate: {policy['cache_hit_rate']:.2%}\n"
+            "Implementation:\n"
+            f"```cpp\n{code}\n```\n\n"
+        )
+
     def generate_prompt(self, workload: str) -> str:
         """Generate a detailed prompt with actual policy implementations"""
         top_policies = self.rag.get_top_policies_by_cache_hit(workload, top_n=2)
         if not top_policies:
             return f"No data available for workload: {workload}"
         
-        parts: List[str] = [
-            "You are a cache policy design expert. Analyze the workload and top policies, then create a new improved policy.\n\n",
-            "# Workload\n",
-            f"Name: {workload}\n",
-            f"Description: {top_policies[0]['workload_description']}\n\n",
+        examples = ''.join([
+            self._format_policy(i, policy) for i, policy in enumerate(top_policies, 1)
+        ])
+        return (
+            "You are a cache policy design expert. Analyze the workload and top policies, then create a new improved policy.\n\n"
+            "# Workload\n"
+            f"Name: {workload}\n"
+            f"Description: {top_policies[0]['workload_description']}\n\n"
             "# Examples\n"
-        ]
-        for i, policy in enumerate(top_policies, 1):
-            code = self._read_policy_code(policy['cpp_file_path'])
-            parts += [
-                f"## Policy {i}\n",
-                f"Name: {policy['policy']}\n",
-                f"Description: {policy['policy_description']}\n",
-                f"Cache Hit Rate: {policy['cache_hit_rate']:.2%}\n",
-                "Implementation:\n",
-                f"```cpp\n{code}\n```\n\n"
-            ]
-        parts += [
-            "# Task\nCreate a new cache replacement policy in C++11 that combines strengths and fixes weaknesses.\n\n",
-            "Your response MUST follow exactly this format:\n",
-            "## Policy Name\n[Policy name]\n\n",
-            "## Policy Description\n[One-paragraph explanation]\n\n",
-            "## C++ Implementation\n",
-            self._get_code_template(),
-            "# Guidelines\n",
-            "1. Include \"../inc/champsim_crc2.h\" at the very top.\n",
-            "2. Implement all five functions: InitReplacementState, GetVictimInSet, UpdateReplacementState, PrintStats, PrintStats_Heartbeat.\n",
+            f"{examples}"
+            "# Task\nCreate a new cache replacement policy in C++11 that combines strengths and fixes weaknesses.\n\n"
+            "Your response MUST follow exactly this format:\n"
+            "## Policy Name\n[Policy name]\n\n"
+            "## Policy Description\n[One-paragraph explanation]\n\n"
+            "## C++ Implementation\n"
+            f"{self._get_code_template()}"
+            "# Guidelines\n"
+            "1. Include \"../inc/champsim_crc2.h\" at the very top.\n"
+            "2. Implement all five functions: InitReplacementState, GetVictimInSet, UpdateReplacementState, PrintStats, PrintStats_Heartbeat.\n"
             "3. In GetVictimInSet, **do not bypass** (i.e., return `LLC_WAYS`) on **WRITEBACK** accesses—only allow bypass for LOAD/RFO/PREFETCH when predictor says 'cold'"
-            "4. Use the BLOCK* current_set pointer and check its .valid field for empty ways.\n",
+            "4. Use the BLOCK* current_set pointer and check its .valid field for empty ways.\n"
             "5. Combine the best ideas; add comments to explain design choices.\n"
-        ]
-        return ''.join(parts)
+        )
     
     def close(self):
         self.rag.close()
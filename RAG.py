@@ -4,9 +4,55 @@ from typing import Tuple
 
 
 class ExperimentRAG:
+    # Only these columns may be interpolated into the ORDER BY clause
+    _Q_TOP = {
+        order_col: f'''
+        SELECT 
+            policy, 
+            policy_description, 
+            workload_description, 
+            cpp_file_path,
+            {order_col}
+        FROM experiments
+        WHERE workload = ?
+        ORDER BY {order_col} DESC
+        LIMIT ?
+        '''
+        for order_col in ('cache_hit_rate', 'score')
+    }
+
+    # run_loop records its experiments with an empty workload_description,
+    # so take the non-empty one for each workload
+    _Q_WORKLOADS = '''
+        SELECT workload, MAX(workload_description)
+        FROM experiments
+        GROUP BY workload
+        ORDER BY workload
+        '''
+
+    _Q_TRACES = '''
+        SELECT DISTINCT workload, cpp_file_path
+        FROM experiments
+        ORDER BY workload, cpp_file_path
+        '''
+
     def __init__(self, db_path: str = 'funsearch.db'):
         """Initialize the RAG system with database connection"""
         self.conn = sqlite3.connect(db_path)
+        # 16 MiB page cache, WAL journaling and in-memory temp tables
+        self.conn.execute("PRAGMA cache_size=-16384")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # Let the top-N queries walk an index instead of sorting the table
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_wl_hit ON experiments(workload, cache_hit_rate DESC)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_wl_score ON experiments(workload, score DESC)"
+        )
+        self.conn.commit()
+        self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
     
     def get_top_policies_by_cache_hit(self, workload: str, top_n: int = 2) -> List[Dict]:
@@ -25,34 +71,7 @@ class ExperimentRAG:
             - cpp file path
             - cache hit rate
         """
-        query = '''
-        SELECT 
-            policy, 
-            policy_description, 
-            workload_description, 
-            cpp_file_path,
-            cache_hit_rate
-        FROM experiments
-        WHERE workload = ?
-        ORDER BY cache_hit_rate DESC
-        LIMIT ?
-        '''
-        
-        self.cursor.execute(query, (workload, top_n))
-        results = self.cursor.fetchall()
-        
-        # Convert results to list of dictionaries
-        policies = []
-        for row in results:
-            policies.append({
-                'policy': row[0],
-                'policy_description': row[1],
-                'workload_description': row[2],
-                'cpp_file_path': row[3],
-                'cache_hit_rate': row[4]
-            })
-        
-        return policies
+        return self._top_policies(workload, top_n, 'cache_hit_rate')
     
     def get_top_policies_by_score(self, workload: str, top_n: int = 2) -> List[Dict]:
         """
@@ -70,34 +89,16 @@ class ExperimentRAG:
             - cpp file path
             - score
         """
-        query = '''
-        SELECT 
-            policy, 
-            policy_description, 
-            workload_description, 
-            cpp_file_path,
-            score
-        FROM experiments
-        WHERE workload = ?
-        ORDER BY score DESC
-        LIMIT ?
-        '''
-        
+        return self._top_policies(workload, top_n, 'score')
+    
+    def _top_policies(self, workload: str, top_n: int, order_col: str) -> List[Dict]:
+        """Retrieve top N policies for a workload ordered by order_col"""
+        query = self._Q_TOP.get(order_col)
+        if query is None:
+            raise ValueError(f"Cannot order policies by: {order_col}")
+
         self.cursor.execute(query, (workload, top_n))
-        results = self.cursor.fetchall()
-        
-        # Convert results to list of dictionaries
-        policies = []
-        for row in results:
-            policies.append({
-                'policy': row[0],
-                'policy_description': row[1],
-                'workload_description': row[2],
-                'cpp_file_path': row[3],
-                'score': row[4]
-            })
-        
-        return policies
+        return [dict(row) for row in self.cursor]
     
     def get_all_workloads_with_description(self) -> str:
         """
@@ -107,19 +108,8 @@ class ExperimentRAG:
             A string in the format:
             "workload1: description1\nworkload2: description2\n..."
         """
-        query = '''
-        SELECT DISTINCT workload, workload_description
-        FROM experiments
-        ORDER BY workload
-        '''
-        
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
-        
-        # Format into "workload: description" lines
-        result = '\n'.join(f"{workload}: {description}" for workload, description in rows)
-    
-        return result
+        self.cursor.execute(self._Q_WORKLOADS)
+        return '\n'.join(f"{workload}: {description}" for workload, description in self.cursor)
 
     def get_all_workloads_with_description_and_traces(self) -> Tuple[str, List[Dict[str, str]]]:
         """
@@ -132,27 +122,15 @@ class ExperimentRAG:
                 - Formatted string: "workload1: description1\nworkload2: description2\n..."
                 - List of dicts: [{"name": workload1, "trace_path": cpp_file_path}, ...]
         """
-        query = '''
-        SELECT DISTINCT workload, workload_description, cpp_file_path
-        FROM experiments
-        ORDER BY workload
-        '''
-        
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
-
-        # For workload descriptions
-        workload_lines = []
-        trace_list = []
-        seen = set()  # Ensure uniqueness by workload (for string part) and (workload, cpp_file_path) for traces
+        workload_desc = self.get_all_workloads_with_description()
 
-        for workload, description, cpp_file_path in rows:
-            if workload not in seen:
-                workload_lines.append(f"{workload}: {description}")
-                seen.add(workload)
-            trace_list.append({"name": workload, "trace_path": cpp_file_path})
+        self.cursor.execute(self._Q_TRACES)
+        trace_list = [
+            {"name": workload, "trace_path": cpp_file_path}
+            for workload, cpp_file_path in self.cursor
+        ]
 
-        return '\n'.join(workload_lines), trace_list
+        return workload_desc, trace_list
 
     def generate_response(self, workload: str) -> str:
         """
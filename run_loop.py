@@ -3,12 +3,17 @@ import sys, os
 sys.path.append(os.path.abspath(".."))
 
 from dotenv import load_dotenv
+import functools
+import hashlib
 import re
+import shutil
 import time
 import sqlite3
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from openai import OpenAI
 from RAG import ExperimentRAG
 from PromptGenerator import PolicyPromptGenerator
@@ -22,13 +27,68 @@ LIB_PATH = "ChampSim_CRC2/lib/config1.a"
 INCLUDE_DIR = "ChampSim_CRC2/inc"
 EXAMPLE_DIR = Path("ChampSim_CRC2/new_policies")
 
+# The policy runs inside every simulation, so build it optimized. Override
+# with CXXFLAGS; successive near-identical policies hit ccache if present.
+CXX = ["ccache", "g++"] if shutil.which("ccache") else ["g++"]
+CXXFLAGS = os.getenv("CXXFLAGS", "-O3 -march=native -flto -fno-plt -DNDEBUG").split()
+
 WARMUP_INST = "1000000"
 SIM_INST = "10000000"
 MODEL = "o4-mini"
 ITERATIONS = 25
 
+# Policies requested, compiled and simulated concurrently per generation;
+# ITERATIONS still counts the total number of policies evaluated.
+POPULATION = 4
+
+# Previous policies longer than this many lines are quoted in refinement
+# prompts with the bodies of their helper functions omitted; the CRC2
+# interface functions and all other top-level code stay verbatim.
+PREV_CODE_LINES = 60
+CRC2_INTERFACE = frozenset({
+    "InitReplacementState",
+    "GetVictimInSet",
+    "UpdateReplacementState",
+    "PrintStats",
+    "PrintStats_Heartbeat",
+})
+
 EXAMPLE_DIR.mkdir(parents=True, exist_ok=True)
 
+# One connection for the whole run, shared by record() and the sim cache.
+_CONN = sqlite3.connect(DB_PATH)
+_CONN.execute("PRAGMA journal_mode=WAL")
+_CONN.execute("PRAGMA synchronous=NORMAL")
+_INSERT_EXPERIMENT = """
+      INSERT INTO experiments
+        (workload, policy, policy_description, workload_description,
+         cpp_file_path, cache_hit_rate, score)
+      VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+# Per-workload hit rates of every simulated policy, keyed by policy_hash(),
+# so regenerated duplicates of an earlier policy are not simulated again.
+_CONN.execute("""
+      CREATE TABLE IF NOT EXISTS sim_cache (
+        code_hash TEXT NOT NULL,
+        workload TEXT NOT NULL,
+        hit_rate REAL NOT NULL,
+        PRIMARY KEY (code_hash, workload)
+      )""")
+
+_RE_NAME = re.compile(r"##\s*Policy\s*Name\s*\n(.*?)\n", re.DOTALL | re.IGNORECASE)
+_RE_DESC = re.compile(r"##\s*Policy\s*Description\s*\n(.*?)\n", re.DOTALL | re.IGNORECASE)
+_RE_CODE = re.compile(r"```cpp\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+_RE_HIT = re.compile(rb"LLC TOTAL\s+ACCESS:\s+(\d+)\s+HIT:\s+(\d+)")
+# A column-0 "<type...> <name>(" that opens a function signature; statements
+# such as "return foo(" or "else if (" are rejected by the keyword guards
+_RE_FUNC = re.compile(
+    r"^(?!(?:return|if|else|for|while|do|switch|case|goto|sizeof|new|delete|throw)\b)"
+    r"(?:[A-Za-z_][\w:]*(?:<[^;()]*>)?[\s\*&]+)+"
+    r"(?!(?:if|for|while|switch|return|sizeof)\b)([A-Za-z_][\w:]*)\s*\("
+)
+# Comments and string/char literals, stripped before counting braces
+_RE_NOT_CODE = re.compile(r"//.*|/\*.*?\*/|\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'")
+
 workloads = [
     {"name": "astar", "trace_path": "ChampSim_CRC2/traces/astar_313B.trace.gz"},
     {"name": "lbm", "trace_path": "ChampSim_CRC2/traces/lbm_564B.trace.gz"},
@@ -45,79 +105,207 @@ def sanitize(name: str) -> str:
     return "".join(c if c.isalnum() else "_" for c in name).strip("_").lower()
 
 def parse_policy_content(text: str,) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-    def _extract(pattern: str):
-        m = re.search(pattern, text, flags=re.DOTALL | re.IGNORECASE)
+    def _extract(pattern: re.Pattern):
+        m = pattern.search(text)
         return m.group(1).strip() if m else None
 
-    name = _extract(r"##\s*Policy\s*Name\s*\n(.*?)\n")
-    desc = _extract(r"##\s*Policy\s*Description\s*\n(.*?)\n")
-    code = _extract(r"```cpp\s*(.*?)\s*```")
+    name = _extract(_RE_NAME)
+    desc = _extract(_RE_DESC)
+    code = _extract(_RE_CODE)
 
     # print(f"📦 [Parse] Extracted policy: {name}")
     return name, desc, code
 
-def compile_policy(cc: Path) -> Path:
-    print(f"     4. 🔨 [Compile] Compiling: {cc.name}\n")
+@functools.lru_cache(maxsize=32)
+def summarize_code(code: str) -> str:
+    lines = code.splitlines()
+    if len(lines) <= PREV_CODE_LINES:
+        return code
+
+    out = []
+    depth = 0
+    func = None      # name of the top-level function whose signature is open
+    body = None      # lines of the helper body being abridged
+    for line in lines:
+        bare = _RE_NOT_CODE.sub("", line)
+        opens, closes = bare.count("{"), bare.count("}")
+        if depth == 0:
+            m = _RE_FUNC.match(line)
+            if m:
+                func = m.group(1)
+        new_depth = depth + opens - closes
+
+        if body is not None:
+            if new_depth > 0:
+                body.append(line)
+                depth = new_depth
+                continue
+            # A one-line body is no longer than the marker replacing it
+            if len(body) > 1:
+                out.append(f"    // ... {len(body)} lines omitted")
+            else:
+                out.extend(body)
+            body = None
+        out.append(line)
+
+        if depth == 0 and (opens or ";" in bare):
+            if new_depth > 0 and func is not None and func not in CRC2_INTERFACE:
+                body = []
+            func = None
+        depth = new_depth
+
+    return "\n".join(out)
+
+def policy_path(i: int, name: str) -> str:
+    return os.path.join(EXAMPLE_DIR, f"{i:03}_{sanitize(name)}.cc")
+
+def write_policy(cc: str, code: str):
+    # One buffered write, no flush/fsync: g++ reads it back via the page cache
+    with open(cc, "w", encoding="utf-8", buffering=1 << 16) as f:
+        f.write(code)
 
-    exe = cc.with_suffix(".out")
+def build_policy(cc: str, code: str) -> str:
+    write_policy(cc, code)
+    return compile_policy(cc)
+
+def compile_policy(cc: str) -> str:
+    print(f"     4. 🔨 [Compile] Compiling: {os.path.basename(cc)}\n")
+
+    exe = cc[:-3] + ".out"
     subprocess.run(
         [
-            "g++",
+            *CXX,
             "-Wall",
             "--std=c++11",
+            *CXXFLAGS,
             f"-I{INCLUDE_DIR}",
-            str(cc),
+            cc,
             LIB_PATH,
             "-o",
-            str(exe),
+            exe,
         ],
         check=True,
     )
     return exe
 
-def run_policy(exe: Path, trace_path: Path) -> str:
-
-    print(f"     5. ⏳ [Simulation] Starting simulation for: {exe.name} and {str(trace_path)}")
+def prefetch_trace(trace_path: str) -> None:
+    # Every iteration re-reads the same traces; ask the kernel to pull them
+    # into the page cache up front instead of on each simulator's first read.
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(trace_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+def run_policy(exe: str, trace_path: str) -> bytes:
+
+    print(f"     5. ⏳ [Simulation] Starting simulation for: {os.path.basename(exe)} and {trace_path}")
     start_time = time.time()
 
-    res = subprocess.run(
-        [
-            str(exe),
-            "-warmup_instructions", WARMUP_INST,
-            "-simulation_instructions", SIM_INST,
-            "-traces", str(trace_path),
-        ],
-        check=True,
-        capture_output=True,
-        text=True,
-    )
+    cmd = [
+        exe,
+        "-warmup_instructions", WARMUP_INST,
+        "-simulation_instructions", SIM_INST,
+        "-traces", trace_path,
+    ]
+    # Scan stdout line by line instead of buffering the (heartbeat-heavy)
+    # output; only the LLC TOTAL line is kept, the rest is drained. Lines stay
+    # bytes, so nothing is ever UTF-8 decoded.
+    stats = b""
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    ) as proc:
+        for line in proc.stdout:
+            if not stats and _RE_HIT.search(line):
+                stats = line
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
 
     duration = time.time() - start_time
-    print(f"     6. 🏁 [Simulation] Finished in {duration:.2f} seconds for: {exe.name} and {trace_path}")
+    print(f"     6. 🏁 [Simulation] Finished in {duration:.2f} seconds for: {os.path.basename(exe)} and {trace_path}")
 
-    return res.stdout
+    return stats
 
-def parse_hit_rate(output: str) -> float:
+def parse_hit_rate(output: bytes) -> float:
     print("     7. 📊 [Metric] Parsing cache hit rate from output")
 
-    m = re.search(r"LLC TOTAL\s+ACCESS:\s+(\d+)\s+HIT:\s+(\d+)", output)
+    m = _RE_HIT.search(output)
     if not m:
         raise RuntimeError("LLC TOTAL not found")
     return int(m.group(2)) / int(m.group(1))
 
-def record(workload, name, desc, cc: Path, rate, workload_desc):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
-      INSERT INTO experiments
-        (workload, policy, policy_description, workload_description,
-         cpp_file_path, cache_hit_rate, score)
-      VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (workload, name, desc, workload_desc, str(cc), rate, rate),
+def simulate(exe: str, trace_path: str) -> float:
+    return parse_hit_rate(run_policy(exe, trace_path))
+
+def ask_model(
+    client: OpenAI,
+    prompt: str,
+    i: int,
+    on_code: Optional[Callable[[str], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> str:
+    print(f"     1. 📤 [LLM] Iteration {i}: Sending prompt to model")
+    stream = client.responses.create(
+        model=MODEL,
+        reasoning={"effort": "high"},
+        input=prompt,
+        stream=True,
     )
-    conn.commit()
-    conn.close()
+
+    # The code block arrives before the closing explanation; hand the text
+    # to on_code as soon as it is complete so compilation can start early.
+    chunks = []
+    for event in stream:
+        if cancelled is not None and cancelled.is_set():
+            # Only checked as events arrive: a request still reasoning emits
+            # none, so it runs on until its first output and is closed there
+            stream.close()
+            print(f"     2. ✖️  [LLM] Iteration {i}: Request discarded")
+            return ""
+        if event.type == "response.output_text.delta":
+            chunks.append(event.delta)
+            if on_code is not None and "`" in event.delta:
+                partial = "".join(chunks)
+                if _RE_CODE.search(partial):
+                    on_code(partial)
+                    on_code = None
+        elif event.type in ("error", "response.failed"):
+            raise RuntimeError(f"❌ [LLM] Iteration {i}: Response stream failed ({event.type})")
+    print(f"     2. 📥 [LLM] Iteration {i}: Response received from OpenAI")
+
+    return "".join(chunks)
+
+def policy_hash(code: str) -> str:
+    # The simulation length is part of the key: changing it changes the rates
+    return hashlib.sha256(f"{WARMUP_INST}:{SIM_INST}:{code}".encode("utf-8")).hexdigest()
+
+def cached_hit_rates(code_hash: str) -> Dict[str, float]:
+    rows = _CONN.execute(
+        "SELECT workload, hit_rate FROM sim_cache WHERE code_hash = ?", (code_hash,)
+    )
+    return dict(rows.fetchall())
+
+def cache_hit_rates(code_hash: str, rates: Dict[str, float]):
+    with _CONN:
+        _CONN.executemany(
+            "INSERT OR REPLACE INTO sim_cache (code_hash, workload, hit_rate) VALUES (?, ?, ?)",
+            [(code_hash, workload, rate) for workload, rate in rates.items()],
+        )
+
+def experiment_row(workload, name, desc, cc: str, rate, workload_desc) -> Tuple:
+    return (workload, name, desc, workload_desc, cc, rate, rate)
+
+def record(rows: List[Tuple]):
+    # A single transaction, so a whole generation costs one commit
+    with _CONN:
+        _CONN.executemany(_INSERT_EXPERIMENT, rows)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -145,126 +333,266 @@ def main():
 
     print(f"     📈 [Init] Starting best cache hit rate: {best_hit:.2%}")
 
+    for trace_info in workloads:
+        prefetch_trace(trace_info["trace_path"])
 
-    prev_name = prev_desc = prev_code = None
-    current_hit = best_hit
-    i=0
-    
-    while True:
-
-        if i == 0:
-            prompt = (
-                f"The following workloads are under consideration:\n"
-                f"{workload_desc}\n\n"
-                "The top-performing cache replacement policies from past experiments are:\n"
-                f"{policy_summary}\n\n"
-                "Your task: Propose a new cache replacement policy that aims to **outperform all of the above policies** "
-                "across these workloads. Consider workload characteristics like branching, memory access patterns, spatial and temporal locality, and phase behavior.\n\n"
-                "Suggested approach:\n"
-                "1) Generate 3-4 distinct policy ideas (divergent thinking), briefly explain why each could help with different workloads.\n"
-                "2) Choose the most promising policy and provide a complete C++ implementation.\n"
-                "3) Include any tunable parameters or knobs, and note what telemetry/statistics should be tracked.\n\n"
-                "Use the exact output format below:\n\n"
-                "## Policy Name\n<name>\n\n"
-                "## Policy Description\n<one paragraph describing the approach and why it helps>\n\n"
-                "## C++ Implementation\n"
-                f"{prompt_gen._get_code_template()}\n"
-            )
-            
-        else:
-            if current_hit > best_hit:
-                feedback = (
-                    f"Great! Policy improved from {best_hit:.2%} to "
-                    f"{current_hit:.2%}. Please refine further."
-                )
-                best_hit = current_hit
-            else:
-                feedback = (
-                    f"Policy hit rate was {current_hit:.2%}, not better than "
-                    f"{best_hit:.2%}. Try a different approach."
-                )
-
-            prompt = (
-                f"The following workloads are under consideration:\n"
-                f"{workload_desc}\n\n"
-                f"Your previous design was **{prev_name}**:\n\n"
-                f"Description:\n{prev_desc}\n\n"
-                f"Implementation:\n```cpp\n{prev_code}\n```\n\n"
-                f"Feedback from the last run:\n{feedback}\n\n"
-                "Task: Refine or redesign the policy to achieve better performance across all workloads. "
-                "Consider workload characteristics such as branching behavior, memory access patterns, spatial and temporal locality, and phase changes. "
-                "You may propose modifications, hybrid approaches, or completely new ideas if needed.\n\n"
-                "Produce the output in the exact format below:\n\n"
-                "## Policy Name\n<name>\n\n"
-                "## Policy Description\n<one paragraph explaining the approach and why it improves performance>\n\n"
-                "## C++ Implementation\n"
-                f"{prompt_gen._get_code_template()}\n"
-            )
-
-        
-        # 5) Call model
-        resp = client.responses.create(
-            model=MODEL,
-            reasoning={"effort": "high"},
-            input=prompt,
-        )
-        print(f"     1. 📤 [LLM] Iteration {i}: Sending prompt to model")
-
-
-        text = resp.output_text
-        print("     2. 📥 [LLM] Response received from OpenAI")
-
-
-        # 6) Parse LLM output
-        name, desc, code = parse_policy_content(text)
-        if not (name and desc and code):
-            raise RuntimeError(f"❌ Parse failed")
-
-        # 7) Write, compile, run
-        base = sanitize(name)
-        cc = EXAMPLE_DIR / f"{i:03}_{base}.cc"
-        cc.write_text(code, encoding="utf-8")
-       
-
-        try:
-            exe = compile_policy(cc)
-        except subprocess.CalledProcessError as e:
-            print(f"❌ [Compile Error]:\n{e}")
-            #compile_error = True
-            continue  # ← this restarts the loop at the top
-        #compile_error=False
-
-        current_hit_tmp=0
-        
-        for trace_info in workloads:
-            WORKLOAD = trace_info["name"]
-            trace_path = trace_info["trace_path"]
 
-            out = run_policy(exe, trace_path)
-            tmp = parse_hit_rate(out)
-            current_hit_tmp += tmp
-            record(WORKLOAD, name, desc, cc, tmp, "")
-            print(f"      [+] {name} → workload: {WORKLOAD} → hit rate: {tmp}\n")
-
-        current_hit = current_hit_tmp / len(workloads)
-        print(f"✅ [Result] Iteration {i}: {name}  → average hit rate {current_hit:.2%}\n")
-
-        # 8) Record experiment
-        record("all",name, desc, cc, current_hit, "")
-
-        i+=1
-
-        if i >= ITERATIONS:
-            break
+    # Everything but the previous design and its feedback is invariant, so
+    # the prompts are assembled from pieces built once here.
+    prompt_prefix = (
+        f"The following workloads are under consideration:\n"
+        f"{workload_desc}\n\n"
+    )
+    template = prompt_gen._get_code_template()
+
+    initial_prompt = (
+        prompt_prefix
+        + "The top-performing cache replacement policies from past experiments are:\n"
+        f"{policy_summary}\n\n"
+        "Your task: Propose a new cache replacement policy that aims to **outperform all of the above policies** "
+        "across these workloads. Consider workload characteristics like branching, memory access patterns, spatial and temporal locality, and phase behavior.\n\n"
+        "Suggested approach:\n"
+        "1) Generate 3-4 distinct policy ideas (divergent thinking), briefly explain why each could help with different workloads.\n"
+        "2) Choose the most promising policy and provide a complete C++ implementation.\n"
+        "3) Include any tunable parameters or knobs, and note what telemetry/statistics should be tracked.\n\n"
+        "Use the exact output format below:\n\n"
+        "## Policy Name\n<name>\n\n"
+        "## Policy Description\n<one paragraph describing the approach and why it helps>\n\n"
+        "## C++ Implementation\n"
+        f"{template}\n"
+    )
 
-        # 9) Prepare for next iteration
-        prev_name, prev_desc, prev_code = name, desc, code
+    refine_suffix = (
+        "Task: Refine or redesign the policy to achieve better performance across all workloads. "
+        "Consider workload characteristics such as branching behavior, memory access patterns, spatial and temporal locality, and phase changes. "
+        "You may propose modifications, hybrid approaches, or completely new ideas if needed.\n\n"
+        "Produce the output in the exact format below:\n\n"
+        "## Policy Name\n<name>\n\n"
+        "## Policy Description\n<one paragraph explaining the approach and why it improves performance>\n\n"
+        "## C++ Implementation\n"
+        f"{template}\n"
+    )
 
+    def refine_prompt(prev_name, prev_desc, prev_code, feedback):
+        return (
+            prompt_prefix
+            + f"Your previous design was **{prev_name}**:\n\n"
+            f"Description:\n{prev_desc}\n\n"
+            f"Implementation:\n```cpp\n{summarize_code(prev_code)}\n```\n\n"
+            f"Feedback from the last run:\n{feedback}\n\n"
+            + refine_suffix
+        )
 
+    def stalled_feedback(seed_hit, best_hit):
+        return (
+            f"Policy hit rate was {seed_hit:.2%} and no variation of it has done better "
+            f"(best so far: {best_hit:.2%}). Try a different approach."
+        )
 
+    # Policies are written and compiled as soon as their code block has
+    # streamed in, keyed by request index so the parsed response can claim them.
+    compile_pool = ThreadPoolExecutor(max_workers=POPULATION)
+    builds = {}
+
+    def start_build(i, cancelled, partial):
+        if cancelled.is_set():
+            return
+        name, _, code = parse_policy_content(partial)
+        if name and code:
+            cc = policy_path(i, name)
+            builds[i] = (code, cc, compile_pool.submit(build_policy, cc, code))
+
+    # Room for a discarded speculative generation next to its replacement
+    llm_pool = ThreadPoolExecutor(max_workers=2 * POPULATION)
+    generation_events = []
+
+    def request_generation(prompt, first, size):
+        # Setting the event skips the generation's early builds and closes
+        # its streams at their next event
+        cancelled = threading.Event()
+        generation_events.append(cancelled)
+        return cancelled, [
+            (i, llm_pool.submit(
+                ask_model, client, prompt, i,
+                functools.partial(start_build, i, cancelled), cancelled,
+            ))
+            for i in range(first, first + size)
+        ]
+
+    seed = None            # best generated policy so far; prompts refine it
+    seed_changed = False
+    feedback = None
+    done = 0               # policies evaluated
+    n = 0                  # policies requested; numbers the .cc files
+    generation = 0
+
+    # The next generation is requested while the current one simulates,
+    # speculating that it will not replace the seed.
+    pending = None
+    
+    try:
+        while done < ITERATIONS:
+
+            if pending is not None and seed_changed:
+                # A new seed means a different prompt. The speculative requests are
+                # already running: signal them to close their streams at the next
+                # event, and cancel any of their builds that have not started yet.
+                cancelled, requests = pending
+                cancelled.set()
+                for i, request in requests:
+                    request.cancel()
+                    _, _, build = builds.pop(i, (None, None, None))
+                    if build is not None:
+                        build.cancel()
+                pending = None
+
+            if pending is not None:
+                _, requests = pending
+                pending = None
+            else:
+                if seed is None:
+                    prompt = initial_prompt
+                else:
+                    prompt = refine_prompt(seed["name"], seed["desc"], seed["code"], feedback)
+
+                # 5) Call model, POPULATION candidates at a time
+                size = min(POPULATION, ITERATIONS - done)
+                _, requests = request_generation(prompt, n, size)
+                n += size
+
+            # 6) Parse LLM output; 7) write and compile each candidate
+            candidates = []
+            for i, request in requests:
+                name, desc, code = parse_policy_content(request.result())
+                if not (name and desc and code):
+                    raise RuntimeError(f"❌ Parse failed")
+
+                # Built while streaming; name/desc may still have changed after
+                # the code block, so only the file and executable are reused.
+                built_code, cc, build = builds.pop(i, (None, None, None))
+                if built_code != code:
+                    cc, build = policy_path(i, name), None
+                    write_policy(cc, code)
+
+                code_hash = policy_hash(code)
+                hits = cached_hit_rates(code_hash)
+                missing = [trace_info for trace_info in workloads if trace_info["name"] not in hits]
+
+                exe = None
+                if missing:
+                    try:
+                        exe = build.result() if build is not None else compile_policy(cc)
+                    except subprocess.CalledProcessError as e:
+                        print(f"❌ [Compile Error]:\n{e}")
+                        continue  # ← this candidate is dropped from the generation
+                else:
+                    print("     4. ♻️  [Cache] Identical policy already simulated, reusing its hit rates\n")
+
+                candidates.append({
+                    "i": i, "name": name, "desc": desc, "code": code, "cc": cc,
+                    "hash": code_hash, "hits": hits, "missing": missing, "exe": exe,
+                })
+            builds.clear()
+
+            if not candidates:
+                continue  # ← nothing compiled; request the generation again
+
+            remaining = ITERATIONS - done - len(candidates)
+            if seed is not None and remaining > 0:
+                size = min(POPULATION, remaining)
+                pending = request_generation(
+                    refine_prompt(
+                        seed["name"], seed["desc"], seed["code"],
+                        stalled_feedback(seed["hit"], best_hit),
+                    ),
+                    n,
+                    size,
+                )
+                n += size
+
+            # Candidates of one generation share a prompt, so identical sources
+            # are likely; simulate each source once and share its rates.
+            unique = {}
+            for c in candidates:
+                if c["missing"]:
+                    unique.setdefault(c["hash"], c)
+
+            # Simulations are independent subprocesses, so run every missing
+            # (source, workload) pair concurrently and only serialize the DB
+            # writes on the main thread.
+            jobs = [(c, trace_info) for c in unique.values() for trace_info in c["missing"]]
+            if jobs:
+                with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+                    rates = pool.map(
+                        simulate,
+                        [c["exe"] for c, _ in jobs],
+                        [trace_info["trace_path"] for _, trace_info in jobs],
+                    )
+                    for (c, trace_info), rate in zip(jobs, rates):
+                        c["hits"][trace_info["name"]] = rate
+
+                for c in unique.values():
+                    cache_hit_rates(
+                        c["hash"],
+                        {trace_info["name"]: c["hits"][trace_info["name"]] for trace_info in c["missing"]},
+                    )
+                for c in candidates:
+                    if c["hash"] in unique:
+                        c["hits"] = unique[c["hash"]]["hits"]
+
+            # 8) Record experiments
+            rows = []
+            for c in candidates:
+                name, desc, cc = c["name"], c["desc"], c["cc"]
+                current_hit_tmp=0
+
+                for trace_info in workloads:
+                    WORKLOAD = trace_info["name"]
+                    tmp = c["hits"][WORKLOAD]
+                    current_hit_tmp += tmp
+                    rows.append(experiment_row(WORKLOAD, name, desc, cc, tmp, ""))
+                    print(f"      [+] {name} → workload: {WORKLOAD} → hit rate: {tmp}\n")
+
+                c["hit"] = current_hit_tmp / len(workloads)
+                print(f"✅ [Result] Iteration {c['i']}: {name}  → average hit rate {c['hit']:.2%}\n")
+
+                rows.append(experiment_row("all", name, desc, cc, c["hit"], ""))
+
+            record(rows)
+
+            done += len(candidates)
+
+            # 9) Seed the next generation with the best policy so far
+            top = max(candidates, key=lambda c: c["hit"])
+            print(f"🧬 [Generation {generation}] Best: {top['name']} → {top['hit']:.2%}\n")
+            generation += 1
+
+            seed_changed = seed is None or top["hit"] > seed["hit"]
+            if seed_changed:
+                seed = top
+                if seed["hit"] > best_hit:
+                    feedback = (
+                        f"Great! Policy improved from {best_hit:.2%} to "
+                        f"{seed['hit']:.2%}. Please refine further."
+                    )
+                    best_hit = seed["hit"]
+                else:
+                    feedback = (
+                        f"Policy hit rate was {seed['hit']:.2%}, not better than "
+                        f"{best_hit:.2%}. Try a different approach."
+                    )
+            else:
+                feedback = stalled_feedback(seed["hit"], best_hit)
+    finally:
+        # Stop whatever is still streaming before waiting on the pools
+        for cancelled in generation_events:
+            cancelled.set()
+        llm_pool.shutdown(cancel_futures=True)
+        compile_pool.shutdown()
 
     prompt_gen.close()
     rag.close()
+    _CONN.close()
 
 
 if __name__ == "__main__":